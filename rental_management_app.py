@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
+import numpy as np
+import itertools
 import uuid
+from datetime import datetime, date, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import firebase_admin
 from firebase_admin import credentials, firestore
 
@@ -13,6 +15,11 @@ st.set_page_config(
     layout="wide"
 )
 
+# Maximum number of operations Firestore accepts in a single write batch
+FIRESTORE_BATCH_LIMIT = 500
+# Tenants rendered per page in Tenant Management
+TENANTS_PER_PAGE = 25
+
 # --- FIREBASE INTEGRATION ---
 @st.cache_resource
 def initialize_firebase():
@@ -43,74 +50,220 @@ def initialize_firebase():
 db = initialize_firebase()
 
 # --- HELPER FUNCTIONS ---
+def _fetch_collection(name, since=None):
+    """Streams the documents of a Firestore collection (optionally only those written after `since`) into a list of dicts."""
+    query = db.collection(name)
+    if since is not None:
+        query = query.where('updated_at', '>', since)
+    records = []
+    for doc in query.stream():
+        record = doc.to_dict()
+        record['id'] = doc.id
+        records.append(record)
+    return records
+
+def _pop_write_times(records, newest=None):
+    """Removes the 'updated_at' write timestamps from records and returns the newest one seen."""
+    for record in records:
+        updated_at = record.pop('updated_at', None)
+        if updated_at is not None and (newest is None or updated_at > newest):
+            newest = updated_at
+    return newest
+
+def _index_tenants():
+    """Rebuilds the tenant lookups derived from st.session_state.tenants after any tenant change."""
+    st.session_state.tenants_by_id = {t['id']: t for t in st.session_state.tenants}
+    # Lowercased names, aligned with st.session_state.tenants, for searching
+    st.session_state.tenant_names_lower = np.array([t['name'].lower() for t in st.session_state.tenants], dtype=str)
+    _bump_version('tenants')
+
+def _amount_to_cents(record):
+    """Converts a legacy float 'amount' field on a record into integer 'amount_cents'."""
+    if 'amount' in record:
+        record['amount_cents'] = round(record.pop('amount') * 100)
+    return record
+
+def _index_loaded_data():
+    """Rebuilds the derived lookups after the session-state collections change."""
+    _index_tenants()
+    for payment_data in st.session_state.payments:
+        _amount_to_cents(payment_data)
+        payment_data['month_key'] = payment_data['date'][:7]
+    for expense_data in st.session_state.expenses:
+        _amount_to_cents(expense_data)
+    # Both frames live in session state rather than st.cache_data, which would unpickle a full copy every rerun.
+    # Rows stay aligned with st.session_state.payments, so a mask over the frame also selects the matching dicts
+    st.session_state.payments_df = _build_payments_df(st.session_state.payments)
+    st.session_state.expenses_df = _build_expenses_df(st.session_state.expenses)
+    _rebuild_payment_index()
+
+def _sync_from_firestore():
+    """Merges documents written since the last sync into st.session_state, matching them by id."""
+    with st.spinner("Syncing changes from database..."):
+        for name in ('tenants', 'payments', 'expenses'):
+            changed = _fetch_collection(name, since=st.session_state.last_sync[name])
+            st.session_state.last_sync[name] = _pop_write_times(changed, st.session_state.last_sync[name])
+            if changed:
+                changed_by_id = {record['id']: record for record in changed}
+                merged = [changed_by_id.pop(record['id'], record) for record in st.session_state[name]]
+                st.session_state[name] = merged + list(changed_by_id.values())
+        _index_loaded_data()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_all():
+    """Reads all three collections from Firestore; the result is shared by every session until a write clears it or the TTL expires."""
+    # Stamped from the process-wide counter before any read, so the stamp orders the snapshot against
+    # loads requested by other sessions even when they wait on this call or get it from the cache
+    started = next(_version_counter())
+    # The three collections are independent network reads, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        tenants_future = executor.submit(_fetch_collection, 'tenants')
+        payments_future = executor.submit(_fetch_collection, 'payments')
+        expenses_future = executor.submit(_fetch_collection, 'expenses')
+
+    data = {
+        'tenants': tenants_future.result(),
+        'payments': payments_future.result(),
+        'expenses': expenses_future.result(),
+    }
+    # Watermarks only ever come from Firestore's own timestamps; a collection with no stamped documents
+    # yet starts from the beginning, which only matches documents written with updated_at
+    earliest = datetime.min.replace(tzinfo=timezone.utc)
+    last_sync = {name: _pop_write_times(records, earliest) for name, records in data.items()}
+    return data, last_sync, started
+
 def load_data_from_firestore():
     """Loads all data from Firestore into st.session_state."""
-    if db and 'data_loaded' not in st.session_state:
+    if not db:
+        return
+    if 'data_loaded' not in st.session_state:
         with st.spinner("Loading data from database..."):
-            st.session_state.tenants = []
-            tenants_ref = db.collection('tenants').stream()
-            for doc in tenants_ref:
-                tenant_data = doc.to_dict()
-                tenant_data['id'] = doc.id
-                st.session_state.tenants.append(tenant_data)
-            
-            st.session_state.payments = []
-            payments_ref = db.collection('payments').stream()
-            for doc in payments_ref:
-                payment_data = doc.to_dict()
-                payment_data['id'] = doc.id
-                st.session_state.payments.append(payment_data)
-
-            st.session_state.expenses = []
-            expenses_ref = db.collection('expenses').stream()
-            for doc in expenses_ref:
-                expense_data = doc.to_dict()
-                expense_data['id'] = doc.id
-                st.session_state.expenses.append(expense_data)
-                
+            requested = next(_version_counter())
+            data, last_sync, started = _fetch_all()
+            st.session_state.tenants = data['tenants']
+            st.session_state.payments = data['payments']
+            st.session_state.expenses = data['expenses']
+            st.session_state.last_sync = last_sync
+
+            _index_loaded_data()
             st.session_state.data_loaded = True
+        # A snapshot whose reads began before this load was requested (served from the cache, or shared
+        # with another session's in-flight fetch) can miss writes made since, so catch up on them;
+        # reads begun after the request need no sync, even one requested at login
+        st.session_state.sync_pending = started < requested
+    if st.session_state.pop('sync_pending', False):
+        _sync_from_firestore()
+
+def _batch_delete(doc_refs):
+    """Deletes Firestore documents in write batches instead of one request per document."""
+    batch = db.batch()
+    pending = 0
+    for doc_ref in doc_refs:
+        batch.delete(doc_ref)
+        pending += 1
+        if pending == FIRESTORE_BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+@st.cache_resource
+def _version_counter():
+    """Process-wide counter, so data versions never collide between sessions sharing st.cache_data."""
+    return itertools.count(1)
+
+def _bump_version(name):
+    """Marks a session-state collection as changed for caches keyed on its version."""
+    st.session_state[f'{name}_version'] = next(_version_counter())
+
+def _build_payments_df(payments):
+    """Builds a tenant_id/date/month_key/amount_cents DataFrame from payment dicts."""
+    # Only the columns the reports filter, group or sum on are copied out of the payment dicts
+    return pd.DataFrame({
+        'tenant_id': [p['tenant_id'] for p in payments],
+        'date': pd.to_datetime([p['date'] for p in payments], format='%Y-%m-%d'),
+        'month_key': [p['month_key'] for p in payments],
+        'amount_cents': np.array([p['amount_cents'] for p in payments], dtype=np.int64),
+    })
+
+def _build_expenses_df(expenses):
+    """Builds a date/amount_cents DataFrame from expense dicts."""
+    return pd.DataFrame({
+        'date': pd.to_datetime([e['date'] for e in expenses], format='%Y-%m-%d'),
+        'amount_cents': np.array([e['amount_cents'] for e in expenses], dtype=np.int64),
+    })
+
+def _rebuild_payment_index():
+    """Aggregates payments per tenant and month into a lookup Series in st.session_state."""
+    payments_df = st.session_state.payments_df
+    st.session_state.payment_sum = payments_df.groupby(['tenant_id', 'month_key'])['amount_cents'].sum()
+
+def _add_to_payment_index(payment):
+    """Adds a single new payment to the per-month index instead of regrouping every payment."""
+    payment_sum = st.session_state.payment_sum
+    key = (payment['tenant_id'], payment['month_key'])
+    payment_sum.loc[key] = payment_sum.get(key, 0) + payment['amount_cents']
+    st.session_state.payment_sum = payment_sum.sort_index()
+
+def _tenant_payment_history(tenant_id):
+    """Lists a tenant's loaded payments, newest first."""
+    # Every payment is already in memory, so the frame's tenant column picks out this tenant's dicts
+    payments_df = st.session_state.payments_df
+    rows = np.flatnonzero((payments_df['tenant_id'] == tenant_id).to_numpy())
+    return sorted((st.session_state.payments[i] for i in rows), key=lambda p: p['date'], reverse=True)
+
+@st.cache_data(max_entries=8)
+def _tenant_options(version, _tenants):
+    """Maps tenant ids to their selectbox labels, once per tenants version."""
+    return {t['id']: f"{t['name']} ({t['property']})" for t in _tenants}
+
+def format_aed(cents):
+    """Formats an amount in integer cents for display."""
+    return f"AED {cents / 100:,.2f}"
 
 def get_tenant_by_id(tenant_id):
     """Finds a tenant in session state by their ID."""
-    for tenant in st.session_state.get('tenants', []):
-        if tenant['id'] == tenant_id:
-            return tenant
-    return None
+    return st.session_state.get('tenants_by_id', {}).get(tenant_id)
+
+@st.cache_data(ttl=600)
+def _calc_balance(rent_cents, start_date_str, monthly_payments, report_month):
+    """Computes a tenant's balance in cents from their rent, lease start and (month_key, amount_cents) payment totals."""
+    # Calculate balance from previous months
+    # The day before the 1st is always in the previous month
+    previous_month = report_month.replace(day=1) - timedelta(days=1)
+    prev_key = previous_month.strftime('%Y-%m')
+    cur_key = report_month.strftime('%Y-%m')
+
+    start_date = date.fromisoformat(start_date_str)
+    # Number of whole months billed from the lease start up to and including the previous month
+    months_charged = max(0, (previous_month.year - start_date.year) * 12 + (previous_month.month - start_date.month) + 1)
+    total_rent_charged_before = months_charged * rent_cents
+    total_paid_before = sum(amount_cents for month_key, amount_cents in monthly_payments if month_key <= prev_key)
+
+    balance_forwarded = total_rent_charged_before - total_paid_before
+    paid_this_month = sum(amount_cents for month_key, amount_cents in monthly_payments if month_key == cur_key)
+
+    total_due = rent_cents + balance_forwarded
+    new_balance = total_due - paid_this_month
+
+    return rent_cents, balance_forwarded, total_due, paid_this_month, new_balance
 
 def calculate_balance(tenant_id, report_month):
-    """Calculates the balance for a tenant for a given month."""
+    """Calculates the balance for a tenant for a given month, in cents."""
     tenant = get_tenant_by_id(tenant_id)
     if not tenant:
         return 0, 0, 0, 0, 0
 
-    rent_due = tenant['rent']
-    
-    # Calculate balance from previous months
-    previous_month = report_month - relativedelta(months=1)
-    total_rent_charged_before = 0
-    total_paid_before = 0
-    
-    start_date = datetime.strptime(tenant['start_date'], '%Y-%m-%d').date()
-    current_month_iter = start_date
-    while current_month_iter.strftime('%Y-%m') <= previous_month.strftime('%Y-%m'):
-        total_rent_charged_before += tenant['rent']
-        current_month_iter += relativedelta(months=1)
-
-    for p in st.session_state.get('payments', []):
-        payment_month = datetime.strptime(p['date'], '%Y-%m-%d').date().strftime('%Y-%m')
-        if p['tenant_id'] == tenant_id and payment_month <= previous_month.strftime('%Y-%m'):
-            total_paid_before += p['amount']
-            
-    balance_forwarded = total_rent_charged_before - total_paid_before
-    
-    paid_this_month = sum(p['amount'] for p in st.session_state.get('payments', [])
-                          if p['tenant_id'] == tenant_id and 
-                          datetime.strptime(p['date'], '%Y-%m-%d').date().strftime('%Y-%m') == report_month.strftime('%Y-%m'))
-    
-    total_due = rent_due + balance_forwarded
-    new_balance = total_due - paid_this_month
-    
-    return rent_due, balance_forwarded, total_due, paid_this_month, new_balance
+    # Hashable snapshot of this tenant's monthly totals; it doubles as the cache key for _calc_balance
+    try:
+        tenant_months = st.session_state.payment_sum.loc[tenant_id]
+    except KeyError:
+        monthly_payments = ()
+    else:
+        monthly_payments = tuple((month_key, int(amount_cents)) for month_key, amount_cents in tenant_months.items())
+
+    return _calc_balance(round(tenant['rent'] * 100), tenant['start_date'], monthly_payments, report_month)
 
 
 # --- UI SECTIONS ---
@@ -133,6 +286,8 @@ def show_dashboard():
         return
 
     start_date, end_date = date_range
+    # Half-open Timestamp bounds keep the comparisons on native datetime64 values
+    start_ts, end_ts = pd.Timestamp(start_date), pd.Timestamp(end_date) + pd.Timedelta(days=1)
     
     # Ensure data is loaded
     if 'tenants' not in st.session_state or 'payments' not in st.session_state or 'expenses' not in st.session_state:
@@ -140,64 +295,43 @@ def show_dashboard():
         return
 
     # Filter data based on the selected date range
-    payments_df = pd.DataFrame(st.session_state.payments)
-    expenses_df = pd.DataFrame(st.session_state.expenses)
+    payments_df = st.session_state.payments_df
+    expenses_df = st.session_state.expenses_df
 
-    # Convert date columns to datetime objects for comparison
-    if not payments_df.empty:
-        payments_df['date'] = pd.to_datetime(payments_df['date']).dt.date
-        filtered_payments = payments_df[(payments_df['date'] >= start_date) & (payments_df['date'] <= end_date)]
-    else:
-        filtered_payments = pd.DataFrame(columns=['date', 'amount'])
-
-    if not expenses_df.empty:
-        expenses_df['date'] = pd.to_datetime(expenses_df['date']).dt.date
-        filtered_expenses = expenses_df[(expenses_df['date'] >= start_date) & (expenses_df['date'] <= end_date)]
-    else:
-        filtered_expenses = pd.DataFrame(columns=['date', 'amount'])
+    filtered_payments = payments_df[(payments_df['date'] >= start_ts) & (payments_df['date'] < end_ts)]
+    filtered_expenses = expenses_df[(expenses_df['date'] >= start_ts) & (expenses_df['date'] < end_ts)]
     
     # --- KPIs ---
-    total_income = filtered_payments['amount'].sum()
-    total_expenses = filtered_expenses['amount'].sum()
+    total_income = int(filtered_payments['amount_cents'].sum())
+    total_expenses = int(filtered_expenses['amount_cents'].sum())
     net_income = total_income - total_expenses
     
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Income", f"AED {total_income:,.2f}")
-    col2.metric("Total Expenses", f"AED {total_expenses:,.2f}")
-    col3.metric("Net Income", f"AED {net_income:,.2f}")
+    col1.metric("Total Income", format_aed(total_income))
+    col2.metric("Total Expenses", format_aed(total_expenses))
+    col3.metric("Net Income", format_aed(net_income))
 
     st.markdown("---")
 
     # --- Monthly Net Income Chart ---
     st.subheader("Monthly Net Income")
 
-    # Prepare data for chart
-    if not filtered_payments.empty:
-        filtered_payments['Month'] = pd.to_datetime(filtered_payments['date']).dt.to_period('M').astype(str)
-        income_summary = filtered_payments.groupby('Month').agg(Income=('amount', 'sum')).reset_index()
-    else:
-        income_summary = pd.DataFrame(columns=['Month', 'Income'])
-
-    if not filtered_expenses.empty:
-        filtered_expenses['Month'] = pd.to_datetime(filtered_expenses['date']).dt.to_period('M').astype(str)
-        expense_summary = filtered_expenses.groupby('Month').agg(Expenses=('amount', 'sum')).reset_index()
-    else:
-        expense_summary = pd.DataFrame(columns=['Month', 'Expenses'])
-
-    # *** FIX: Use an outer merge and fill NaNs to prevent KeyError ***
-    if not income_summary.empty or not expense_summary.empty:
-        monthly_summary = pd.merge(income_summary, expense_summary, on='Month', how='outer')
-        # Fill NaN values with 0 for months that have income but no expenses, or vice versa
-        monthly_summary['Income'] = monthly_summary['Income'].fillna(0)
-        monthly_summary['Expenses'] = monthly_summary['Expenses'].fillna(0)
-        
-        # Calculate Net Income
-        monthly_summary['Net Income'] = monthly_summary['Income'] - monthly_summary['Expenses']
-        
-        # Sort by month to ensure the chart is chronological
-        monthly_summary = monthly_summary.sort_values('Month')
-
-        st.bar_chart(monthly_summary.set_index('Month')['Net Income'])
+    # Income and expenses share one frame, so a single groupby totals both per month
+    all_entries = pd.concat([
+        filtered_payments.assign(kind='Income'),
+        filtered_expenses.assign(kind='Expenses'),
+    ], ignore_index=True)
+
+    if not all_entries.empty:
+        # Truncating to datetime64[M] buckets by month without allocating a Period per row
+        months = all_entries['date'].values.astype('datetime64[M]').astype(str)
+        monthly_summary = all_entries.groupby([months, 'kind'], sort=True)['amount_cents'].sum().unstack(fill_value=0)
+        monthly_summary.index.name = 'Month'
+        # A range with only income or only expenses still needs both columns
+        monthly_summary = monthly_summary.reindex(columns=['Income', 'Expenses'], fill_value=0)
+        monthly_summary['Net Income'] = (monthly_summary['Income'] - monthly_summary['Expenses']) / 100
+
+        st.bar_chart(monthly_summary['Net Income'])
     else:
         st.info("No income or expense data available for the selected period to display a chart.")
 
@@ -222,11 +356,13 @@ def manage_tenants():
                             'start_date': start_date.strftime('%Y-%m-%d'),
                             'deposit': deposit
                         }
-                        update_time, doc_ref = db.collection('tenants').add(new_tenant_data)
-                        new_tenant_data['id'] = doc_ref.id
+                        new_tenant_id = uuid.uuid4().hex
+                        db.collection('tenants').document(new_tenant_id).set({**new_tenant_data, 'updated_at': firestore.SERVER_TIMESTAMP})
+                        _fetch_all.clear()
+                        new_tenant_data['id'] = new_tenant_id
                         st.session_state.tenants.append(new_tenant_data)
+                        _index_tenants()
                         st.success(f"Tenant '{name}' added successfully!")
-                    st.rerun()
                 else:
                     st.error("Please fill in all fields.")
 
@@ -238,12 +374,23 @@ def manage_tenants():
     else:
         search_query = st.text_input("Search Tenants by Name")
         
-        filtered_tenants = [t for t in st.session_state.tenants if search_query.lower() in t['name'].lower()]
+        if not search_query:
+            filtered_tenants = st.session_state.tenants
+        else:
+            matches = np.char.find(st.session_state.tenant_names_lower, search_query.lower()) >= 0
+            filtered_tenants = [st.session_state.tenants[i] for i in np.flatnonzero(matches)]
 
         if not filtered_tenants:
             st.warning("No tenants match your search.")
         else:
-            for i, tenant in enumerate(filtered_tenants):
+            # Only one page of tenants gets its widgets built on each rerun
+            page_count = (len(filtered_tenants) + TENANTS_PER_PAGE - 1) // TENANTS_PER_PAGE
+            page = 1
+            if page_count > 1:
+                page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+            page_tenants = filtered_tenants[(page - 1) * TENANTS_PER_PAGE:page * TENANTS_PER_PAGE]
+
+            for i, tenant in enumerate(page_tenants):
                 with st.container():
                     st.markdown(f"#### {tenant['name']} ({tenant['property']})")
                     cols = st.columns([2, 2, 2, 1, 1])
@@ -257,14 +404,20 @@ def manage_tenants():
                     if cols[4].button("🗑️ Delete", key=f"delete_{tenant['id']}"):
                         if db:
                             with st.spinner("Deleting tenant..."):
-                                db.collection('tenants').document(tenant['id']).delete()
-                                # Also delete associated payments
-                                payments_to_delete = db.collection('payments').where('tenant_id', '==', tenant['id']).stream()
-                                for p in payments_to_delete:
-                                    p.reference.delete()
+                                # Also delete associated payments; select([]) fetches only their references
+                                payments_to_delete = db.collection('payments').where('tenant_id', '==', tenant['id']).select([]).stream()
+                                _batch_delete(itertools.chain(
+                                    [db.collection('tenants').document(tenant['id'])],
+                                    (p.reference for p in payments_to_delete)
+                                ))
+                                _fetch_all.clear()
                                 
                                 st.session_state.tenants = [t for t in st.session_state.tenants if t['id'] != tenant['id']]
+                                _index_tenants()
                                 st.session_state.payments = [p for p in st.session_state.payments if p['tenant_id'] != tenant['id']]
+                                payments_df = st.session_state.payments_df
+                                st.session_state.payments_df = payments_df[payments_df['tenant_id'] != tenant['id']].reset_index(drop=True)
+                                st.session_state.payment_sum = st.session_state.payment_sum.drop(tenant['id'], level='tenant_id', errors='ignore')
                             st.success(f"Tenant {tenant['name']} and all associated payments have been deleted.")
                             st.rerun()
                 
@@ -275,7 +428,7 @@ def manage_tenants():
                         new_property = st.text_input("Property", value=tenant['property'])
                         new_rent = st.number_input("Rent", value=tenant['rent'], format="%.2f")
                         new_deposit = st.number_input("Deposit Amount", value=tenant.get('deposit', 0.0), format="%.2f")
-                        new_start_date = st.date_input("Start Date", value=datetime.strptime(tenant['start_date'], '%Y-%m-%d').date())
+                        new_start_date = st.date_input("Start Date", value=date.fromisoformat(tenant['start_date']))
 
                         save_col, cancel_col = st.columns(2)
                         if save_col.form_submit_button("Save Changes"):
@@ -286,8 +439,10 @@ def manage_tenants():
                                     'deposit': new_deposit
                                 }
                                 if db:
-                                    db.collection('tenants').document(tenant['id']).update(updated_data)
+                                    db.collection('tenants').document(tenant['id']).update({**updated_data, 'updated_at': firestore.SERVER_TIMESTAMP})
+                                    _fetch_all.clear()
                                     tenant.update(updated_data)
+                                    _index_tenants()
                                     del st.session_state.edit_tenant_id
                                     st.success("Changes saved!")
                             st.rerun()
@@ -306,7 +461,7 @@ def manage_payments():
 
     with st.expander("💰 Record New Payment", expanded=True):
         with st.form("new_payment_form", clear_on_submit=True):
-            tenant_options = {t['id']: f"{t['name']} ({t['property']})" for t in st.session_state.tenants}
+            tenant_options = _tenant_options(st.session_state.tenants_version, st.session_state.tenants)
             tenant_id = st.selectbox(
                 "Select Tenant",
                 options=list(tenant_options.keys()),
@@ -324,13 +479,19 @@ def manage_payments():
                     new_payment_data = {
                         'tenant_id': tenant_id,
                         'date': payment_date.strftime('%Y-%m-%d'),
-                        'amount': amount
+                        'amount_cents': round(amount * 100)
                     }
-                    update_time, doc_ref = db.collection('payments').add(new_payment_data)
-                    new_payment_data['id'] = doc_ref.id
+                    new_payment_id = uuid.uuid4().hex
+                    db.collection('payments').document(new_payment_id).set({**new_payment_data, 'updated_at': firestore.SERVER_TIMESTAMP})
+                    _fetch_all.clear()
+                    new_payment_data['id'] = new_payment_id
+                    new_payment_data['month_key'] = new_payment_data['date'][:7]
                     st.session_state.payments.append(new_payment_data)
+                    st.session_state.payments_df = pd.concat(
+                        [st.session_state.payments_df, _build_payments_df([new_payment_data])], ignore_index=True
+                    )
+                    _add_to_payment_index(new_payment_data)
                     st.success(f"Payment of AED {amount} recorded for {tenant_options[tenant_id]}.")
-                st.rerun()
 
     st.markdown("---")
     
@@ -338,53 +499,50 @@ def manage_payments():
     report_month = st.date_input("Select Month for Report", datetime.now().date(), key="report_month_selector")
     report_month_str = report_month.strftime('%Y-%m')
 
-    all_payments = st.session_state.get('payments', [])
-    payments_in_month = [
-        p for p in all_payments
-        if datetime.strptime(p['date'], '%Y-%m-%d').strftime('%Y-%m') == report_month_str
-    ]
+    all_payments = st.session_state.payments
+    payments_df = st.session_state.payments_df
+    in_month = (payments_df['month_key'] == report_month_str).to_numpy()
+    payments_in_month = [all_payments[i] for i in np.flatnonzero(in_month)]
     
-    total_collected = sum(p['amount'] for p in payments_in_month)
-    st.metric(f"Total Rent Collected in {report_month.strftime('%B %Y')}", f"AED {total_collected:,.2f}")
+    month_totals = payments_df.loc[in_month].groupby('tenant_id')['amount_cents'].sum()
+    total_collected = int(month_totals.sum())
+    st.metric(f"Total Rent Collected in {report_month.strftime('%B %Y')}", format_aed(total_collected))
 
     st.write("#### Tenants Who Paid This Month")
     
-    # Group payments by tenant to handle multiple payments
-    payments_by_tenant = {}
-    for payment in payments_in_month:
-        tenant_id = payment['tenant_id']
-        if tenant_id not in payments_by_tenant:
-            payments_by_tenant[tenant_id] = []
-        payments_by_tenant[tenant_id].append(payment)
-
-    if not payments_by_tenant:
+    if not payments_in_month:
         st.info("No payments were recorded for this month.")
     else:
-        # Create a list of tenant info for sorting and display
+        # One sort by (tenant name, tenant id, date) lets a single linear pass group each tenant's
+        # payments, with tenants already in name order and their payments in date order
+        tenants_by_id = st.session_state.tenants_by_id
+        known_payments = sorted(
+            (p for p in payments_in_month if p['tenant_id'] in tenants_by_id),
+            key=lambda p: (tenants_by_id[p['tenant_id']]['name'], p['tenant_id'], p['date'])
+        )
         tenant_report_list = []
-        for tenant_id, payments in payments_by_tenant.items():
-            tenant = get_tenant_by_id(tenant_id)
-            if tenant:
-                tenant_report_list.append({
-                    'name': tenant['name'],
-                    'property': tenant['property'],
-                    'payments': sorted(payments, key=lambda x: x['date']) # Sort payments by date
-                })
+        for tenant_id, payments in itertools.groupby(known_payments, key=lambda p: p['tenant_id']):
+            tenant = tenants_by_id[tenant_id]
+            tenant_report_list.append({
+                'name': tenant['name'],
+                'property': tenant['property'],
+                'total_paid': int(month_totals[tenant_id]),
+                'payments': list(payments)
+            })
 
         # Display sorted tenant list
-        for tenant_info in sorted(tenant_report_list, key=lambda x: x['name']):
-            total_paid_by_tenant = sum(p['amount'] for p in tenant_info['payments'])
-            st.markdown(f"- **{tenant_info['name']}** ({tenant_info['property']}) - Total Paid: AED {total_paid_by_tenant:,.2f}")
+        for tenant_info in tenant_report_list:
+            st.markdown(f"- **{tenant_info['name']}** ({tenant_info['property']}) - Total Paid: {format_aed(tenant_info['total_paid'])}")
             # Display each individual payment with its date
             for payment in tenant_info['payments']:
-                 st.markdown(f"  - `Paid AED {payment['amount']:,.2f} on {payment['date']}`")
+                 st.markdown(f"  - `Paid {format_aed(payment['amount_cents'])} on {payment['date']}`")
 
 
     st.markdown("---")
     
     st.subheader("Tenant Balances & History")
     
-    tenant_options = {t['id']: f"{t['name']} ({t['property']})" for t in st.session_state.get('tenants', [])}
+    tenant_options = _tenant_options(st.session_state.tenants_version, st.session_state.tenants)
     if not tenant_options:
         st.info("No tenants to display.")
         return
@@ -404,19 +562,19 @@ def manage_payments():
 
         st.write(f"### Balance Summary for {report_month_dt.strftime('%B %Y')}")
         summary_cols = st.columns(5)
-        summary_cols[0].metric("Balance Forwarded", f"AED {balance_forwarded:,.2f}")
-        summary_cols[1].metric("Month's Rent", f"AED {rent_due:,.2f}")
-        summary_cols[2].metric("Total Due", f"AED {total_due:,.2f}")
-        summary_cols[3].metric("Paid This Month", f"AED {paid_this_month:,.2f}")
-        summary_cols[4].metric("Ending Balance", f"AED {new_balance:,.2f}", delta=f"{-new_balance:,.2f}" if new_balance != 0 else "")
+        summary_cols[0].metric("Balance Forwarded", format_aed(balance_forwarded))
+        summary_cols[1].metric("Month's Rent", format_aed(rent_due))
+        summary_cols[2].metric("Total Due", format_aed(total_due))
+        summary_cols[3].metric("Paid This Month", format_aed(paid_this_month))
+        summary_cols[4].metric("Ending Balance", format_aed(new_balance), delta=f"{-new_balance / 100:,.2f}" if new_balance != 0 else "")
         
         st.markdown("---")
         st.write("#### Payment History")
         
-        tenant_payments = [p for p in st.session_state.get('payments', []) if p['tenant_id'] == view_tenant_id]
+        tenant_payments = _tenant_payment_history(view_tenant_id)
         if tenant_payments:
             payments_df = pd.DataFrame(tenant_payments)
-            payments_df = payments_df.sort_values(by='date', ascending=False)
+            payments_df['amount'] = payments_df['amount_cents'] / 100
             st.dataframe(payments_df[['date', 'amount']].style.format({"amount": "AED {:,.2f}"}))
         else:
             st.info("No payments recorded for this tenant yet.")
@@ -435,14 +593,18 @@ def manage_expenses():
                 with st.spinner("Adding expense..."):
                     new_expense_data = {
                         'description': description,
-                        'amount': amount,
+                        'amount_cents': round(amount * 100),
                         'date': expense_date.strftime('%Y-%m-%d')
                     }
-                    update_time, doc_ref = db.collection('expenses').add(new_expense_data)
-                    new_expense_data['id'] = doc_ref.id
+                    new_expense_id = uuid.uuid4().hex
+                    db.collection('expenses').document(new_expense_id).set({**new_expense_data, 'updated_at': firestore.SERVER_TIMESTAMP})
+                    _fetch_all.clear()
+                    new_expense_data['id'] = new_expense_id
                     st.session_state.expenses.append(new_expense_data)
+                    st.session_state.expenses_df = pd.concat(
+                        [st.session_state.expenses_df, _build_expenses_df([new_expense_data])], ignore_index=True
+                    )
                     st.success(f"Expense '{description}' of AED {amount} added.")
-                st.rerun()
 
     st.markdown("---")
 
@@ -452,6 +614,7 @@ def manage_expenses():
     else:
         expenses_df = pd.DataFrame(st.session_state.get('expenses', []))
         expenses_df = expenses_df.sort_values(by='date', ascending=False)
+        expenses_df['amount'] = expenses_df.pop('amount_cents') / 100
         
         expenses_df['delete'] = False
         edited_df = st.data_editor(
@@ -460,13 +623,14 @@ def manage_expenses():
             disabled=["id", "description", "amount", "date"], hide_index=True,
         )
 
-        expenses_to_delete = edited_df[edited_df['delete']].id.tolist()
+        expenses_to_delete = set(edited_df.loc[edited_df['delete'], 'id'])
         if expenses_to_delete and db:
             with st.spinner("Deleting expense(s)..."):
-                for doc_id in expenses_to_delete:
-                    db.collection('expenses').document(doc_id).delete()
+                _batch_delete(db.collection('expenses').document(doc_id) for doc_id in expenses_to_delete)
+                _fetch_all.clear()
                 
                 st.session_state.expenses = [exp for exp in st.session_state.expenses if exp['id'] not in expenses_to_delete]
+                st.session_state.expenses_df = _build_expenses_df(st.session_state.expenses)
                 st.warning("Expense(s) deleted. Rerunning...")
             st.rerun()
 
@@ -507,6 +671,8 @@ def show_login_form():
                     
                     if username == admin_user and password == admin_pass:
                         st.session_state.authenticated = True
+                        # Pick up changes made from other sessions while this one was logged out
+                        st.session_state.sync_pending = True
                         st.rerun() # Re-added to fix the "double enter" bug by forcing an immediate script rerun.
                     else:
                         st.error("The username or password you entered is incorrect.")
@@ -524,6 +690,12 @@ def show_main_app():
         if st.sidebar.button("Logout"):
             st.session_state.authenticated = False
             st.rerun()
+
+        if st.sidebar.button("Refresh Data"):
+            # Drop the shared snapshot and this session's copy to force a full reload
+            _fetch_all.clear()
+            del st.session_state.data_loaded
+            st.rerun()
             
         selection = st.sidebar.radio("Go to", ["Dashboard", "Tenant Management", "Payment Management", "Expense Management"])
 